@@ -9,20 +9,10 @@ import sha
 # Size of the secret key (in bytes)
 KEY_SIZE = 128 // 8
 
-VERBOSE = False
-
-
-def slice_bytes(val: int, n: int) -> int:
-    """ Slice the first n bytes off of val. """
-    val_bytes = val.to_bytes((val.bit_length() + 7) // 8, byteorder="big")
-    return int.from_bytes(val_bytes[n:], byteorder="big")
-
+# Placeholder bytes standing in for the secret when padding m
+KEY_PLACEHOLDER = b"x" * KEY_SIZE
 
-def concatenate(a: int, b: int) -> int:
-    """ Concatenate b to the end of a. """
-    a_bytes = a.to_bytes((a.bit_length() + 7) // 8, byteorder="big")
-    b_bytes = b.to_bytes((b.bit_length() + 7) // 8, byteorder="big")
-    return int.from_bytes(a_bytes + b_bytes, byteorder="big")
+VERBOSE = False
 
 
 def extend(m: str, m_malicious: str, MAC: int):
@@ -32,24 +22,27 @@ def extend(m: str, m_malicious: str, MAC: int):
     """
 
     # Use sha.pad to automatically pad m for us.
-    # Use "x" * KEY_SIZE as placeholder for the secret.
-    padded_m = sha.pad(sha.encode_string("x"*KEY_SIZE + m))
-    num_blocks = len(sha.parse(padded_m))
+    # Use KEY_PLACEHOLDER as a stand-in for the secret.
+    padded_m = sha.pad(KEY_PLACEHOLDER + m.encode("latin-1"))
+    num_blocks = len(padded_m) // 64
 
     # m' = m || padding || K || m_malicious
-    m_prime = concatenate(padded_m, sha.encode_string(m_malicious))
+    m_prime = padded_m + m_malicious.encode("latin-1")
     __debug_print("Mallory's calculated m_prime:")
     __print_hex_chars(m_prime)
 
-    blocks = sha.parse(sha.pad(m_prime))
+    padded_m_prime = sha.pad(m_prime)
 
-    # Compute the new MAC' by using the original MAC as the first IV
-    cv = MAC
-    for block in blocks[num_blocks:]:
-        cv = sha.hash(cv, block)
+    # Compute the new MAC' by using the original MAC as the first IV,
+    # feeding each 64-byte continuation block through the raw-buffer
+    # fast path as a zero-copy window into the padded message
+    cv = MAC.to_bytes(20, byteorder="big")
+    view = memoryview(padded_m_prime)
+    for i in range(num_blocks * 64, len(view), 64):
+        cv = sha.hash_bytes(cv, view[i:i+64])
 
     # Remove the "x" * KEY_SIZE placeholder secret
-    return (slice_bytes(m_prime, KEY_SIZE), f"{cv:040x}")
+    return (m_prime[KEY_SIZE:], cv.hex())
 
 
 def run(S: str, m: str, m_malicious: str, MAC: str = None):
@@ -62,29 +55,54 @@ def run(S: str, m: str, m_malicious: str, MAC: str = None):
     S = (S + "pad"*16)[:16]
 
     # Alice calculates MAC = SHA1(S || m)
-    MAC_a = int(sha.sha1(sha.encode_string(S + m)), 16) if not MAC else int(MAC, 16)
+    MAC_a = int(sha.sha1((S + m).encode("latin-1")), 16) if not MAC else int(MAC, 16)
 
     # Mallory extends the message m and sends Bob m' and MAC'
     m_prime, MAC_prime = extend(m, m_malicious, MAC_a)
 
     # Bob calculates MAC = SHA1(S || m')
-    MAC_b = sha.sha1(concatenate(sha.encode_string(S), m_prime))
+    MAC_b = sha.sha1(S.encode("latin-1") + m_prime)
 
     __debug_print("Bob will calculate SHA1 of:")
-    __print_hex_chars(concatenate(sha.encode_string(S), m_prime))
+    __print_hex_chars(S.encode("latin-1") + m_prime)
 
     # MAC' should be equal to Bob's MAC
     return m_prime, MAC_prime, MAC_b
 
 
-def __print_hex_chars(val: int) -> None:
+def run_batch(cases: list) -> list:
+    """
+    Perform many independent test runs at once. cases holds
+    (S, m, m_malicious) triples; the result is a list of
+    (m', MAC', HMAC(S, m')) tuples, one per case. Alice's and Bob's
+    MAC computations are each hashed as a single parallel batch
+    instead of one message at a time.
+    """
+    secrets = [(S + "pad"*16)[:16] for S, _, _ in cases]
+
+    # Alice calculates MAC = SHA1(S || m) for every case
+    MACs = sha.sha1_many([(s + m).encode("latin-1")
+                          for s, (_, m, _) in zip(secrets, cases)])
+
+    # Mallory extends each message using Alice's MAC as the IV
+    extended = [extend(m, m_malicious, int(MAC, 16))
+                for (_, m, m_malicious), MAC in zip(cases, MACs)]
+
+    # Bob calculates MAC = SHA1(S || m') for every case
+    HMACs = sha.sha1_many([s.encode("latin-1") + m_prime
+                           for s, (m_prime, _) in zip(secrets, extended)])
+
+    return [(m_prime, MAC_prime, HMAC)
+            for (m_prime, MAC_prime), HMAC in zip(extended, HMACs)]
+
+
+def __print_hex_chars(val: bytes) -> None:
     """
     Print a value in hexadecimal with ASCII characters printed only if
     verbose logging is enabled.
     """
     if VERBOSE:
-        val_bytes = val.to_bytes((val.bit_length() + 7) // 8, byteorder="big")
-        for b in val_bytes:
+        for b in val:
             if 0x20 <= b <= 0x7E:
                 print(chr(b), end=" ")
             else:
@@ -94,7 +112,7 @@ def __print_hex_chars(val: int) -> None:
 
 def __get_hex(val: str) -> None:
     """ Get the hex representation of the given string. """
-    return "".join(f'{ord(c):02x}' for c in val) + f' ("{val}")'
+    return val.encode("latin-1").hex() + f' ("{val}")'
 
 
 def __debug_print(*args):
@@ -140,7 +158,7 @@ if __name__ == "__main__":
     if not args.secret:
         args.secret = "secret"
 
-    MAC = args.mac if args.mac else sha.sha1(sha.encode_string(args.secret + args.message))
+    MAC = args.mac if args.mac else sha.sha1((args.secret + args.message).encode("latin-1"))
 
     m_prime, MAC_prime, HMAC = run(args.secret, args.message, args.malicious, args.mac)
 
@@ -152,7 +170,7 @@ if __name__ == "__main__":
 
     __print("\nMallory extends m to create m' = m || padding || K || malicious text", color="1;33")
     __print(f"malicious text= 0x{__get_hex(args.malicious)}")
-    __print(f"m'= 0x{m_prime:x}")
+    __print(f"m'= 0x{m_prime.hex()}")
 
     __print("\nMallory calculates a new MAC' using Alice's MAC as the intermediate value to SHA1:", color="1;33")
     __print(f"MAC'= 0x{MAC_prime}")
@@ -0,0 +1,248 @@
+"""
+Build the optional _sha1_compress C extension with cffi.
+
+The extension exposes a multi-block SHA-1 compression function that
+dispatches at runtime to Intel SHA-NI instructions when the CPU has
+them (one round group per instruction) and to a portable scalar
+implementation otherwise. sha.py falls back to the numba kernel when
+the extension has not been built:
+
+    pip3 install cffi && python3 build_compress.py
+"""
+
+from cffi import FFI
+
+ffibuilder = FFI()
+
+ffibuilder.cdef(
+    "void sha1_compress_blocks(uint32_t *state, const uint8_t *blocks, size_t nblocks);")
+
+C_SOURCE = r"""
+#include <stdint.h>
+#include <stddef.h>
+
+#define ROTL32(x, n) (((x) << (n)) | ((x) >> (32 - (n))))
+
+/* Portable scalar compression of one 64-byte block (FIPS 180-4 6.1.2) */
+static void sha1_compress_scalar(uint32_t state[5], const uint8_t *block)
+{
+    uint32_t w[16];
+    uint32_t a, b, c, d, e, f, k, tmp;
+    int t;
+
+    for (t = 0; t < 16; t++)
+        w[t] = ((uint32_t)block[t*4] << 24) | ((uint32_t)block[t*4+1] << 16) |
+               ((uint32_t)block[t*4+2] << 8) | (uint32_t)block[t*4+3];
+
+    a = state[0]; b = state[1]; c = state[2]; d = state[3]; e = state[4];
+
+    for (t = 0; t < 80; t++) {
+        if (t >= 16) {
+            tmp = w[(t-3) & 15] ^ w[(t-8) & 15] ^ w[(t-14) & 15] ^ w[t & 15];
+            w[t & 15] = ROTL32(tmp, 1);
+        }
+        if (t < 20)      { f = (b & c) ^ (~b & d);           k = 0x5a827999; }
+        else if (t < 40) { f = b ^ c ^ d;                    k = 0x6ed9eba1; }
+        else if (t < 60) { f = (b & c) ^ (b & d) ^ (c & d);  k = 0x8f1bbcdc; }
+        else             { f = b ^ c ^ d;                    k = 0xca62c1d6; }
+        tmp = ROTL32(a, 5) + f + e + k + w[t & 15];
+        e = d; d = c; c = ROTL32(b, 30); b = a; a = tmp;
+    }
+
+    state[0] += a; state[1] += b; state[2] += c; state[3] += d; state[4] += e;
+}
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <immintrin.h>
+
+/* One 64-byte block with the SHA1RNDS4/SHA1NEXTE/SHA1MSG1/SHA1MSG2
+ * instructions, four rounds per SHA1RNDS4 */
+__attribute__((target("sha,sse4.1,ssse3")))
+static void sha1_compress_shani(uint32_t state[5], const uint8_t *block)
+{
+    __m128i ABCD, ABCD_SAVE, E0, E0_SAVE, E1;
+    __m128i MSG0, MSG1, MSG2, MSG3;
+    const __m128i MASK = _mm_set_epi64x(
+        0x0001020304050607ULL, 0x08090a0b0c0d0e0fULL);
+
+    ABCD = _mm_loadu_si128((const __m128i*) state);
+    E0 = _mm_set_epi32((int) state[4], 0, 0, 0);
+    ABCD = _mm_shuffle_epi32(ABCD, 0x1B);
+
+    ABCD_SAVE = ABCD;
+    E0_SAVE = E0;
+
+    /* Rounds 0-3 */
+    MSG0 = _mm_loadu_si128((const __m128i*)(block + 0));
+    MSG0 = _mm_shuffle_epi8(MSG0, MASK);
+    E0 = _mm_add_epi32(E0, MSG0);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 0);
+
+    /* Rounds 4-7 */
+    MSG1 = _mm_loadu_si128((const __m128i*)(block + 16));
+    MSG1 = _mm_shuffle_epi8(MSG1, MASK);
+    E1 = _mm_sha1nexte_epu32(E1, MSG1);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 0);
+    MSG0 = _mm_sha1msg1_epu32(MSG0, MSG1);
+
+    /* Rounds 8-11 */
+    MSG2 = _mm_loadu_si128((const __m128i*)(block + 32));
+    MSG2 = _mm_shuffle_epi8(MSG2, MASK);
+    E0 = _mm_sha1nexte_epu32(E0, MSG2);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 0);
+    MSG1 = _mm_sha1msg1_epu32(MSG1, MSG2);
+    MSG0 = _mm_xor_si128(MSG0, MSG2);
+
+    /* Rounds 12-15 */
+    MSG3 = _mm_loadu_si128((const __m128i*)(block + 48));
+    MSG3 = _mm_shuffle_epi8(MSG3, MASK);
+    MSG0 = _mm_sha1msg2_epu32(MSG0, MSG3);
+    E1 = _mm_sha1nexte_epu32(E1, MSG3);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 0);
+    MSG2 = _mm_sha1msg1_epu32(MSG2, MSG3);
+    MSG1 = _mm_xor_si128(MSG1, MSG3);
+    /* Rounds 16-19 */
+    MSG1 = _mm_sha1msg2_epu32(MSG1, MSG0);
+    E0 = _mm_sha1nexte_epu32(E0, MSG0);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 0);
+    MSG3 = _mm_sha1msg1_epu32(MSG3, MSG0);
+    MSG2 = _mm_xor_si128(MSG2, MSG0);
+    /* Rounds 20-23 */
+    MSG2 = _mm_sha1msg2_epu32(MSG2, MSG1);
+    E1 = _mm_sha1nexte_epu32(E1, MSG1);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 1);
+    MSG0 = _mm_sha1msg1_epu32(MSG0, MSG1);
+    MSG3 = _mm_xor_si128(MSG3, MSG1);
+    /* Rounds 24-27 */
+    MSG3 = _mm_sha1msg2_epu32(MSG3, MSG2);
+    E0 = _mm_sha1nexte_epu32(E0, MSG2);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 1);
+    MSG1 = _mm_sha1msg1_epu32(MSG1, MSG2);
+    MSG0 = _mm_xor_si128(MSG0, MSG2);
+    /* Rounds 28-31 */
+    MSG0 = _mm_sha1msg2_epu32(MSG0, MSG3);
+    E1 = _mm_sha1nexte_epu32(E1, MSG3);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 1);
+    MSG2 = _mm_sha1msg1_epu32(MSG2, MSG3);
+    MSG1 = _mm_xor_si128(MSG1, MSG3);
+    /* Rounds 32-35 */
+    MSG1 = _mm_sha1msg2_epu32(MSG1, MSG0);
+    E0 = _mm_sha1nexte_epu32(E0, MSG0);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 1);
+    MSG3 = _mm_sha1msg1_epu32(MSG3, MSG0);
+    MSG2 = _mm_xor_si128(MSG2, MSG0);
+    /* Rounds 36-39 */
+    MSG2 = _mm_sha1msg2_epu32(MSG2, MSG1);
+    E1 = _mm_sha1nexte_epu32(E1, MSG1);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 1);
+    MSG0 = _mm_sha1msg1_epu32(MSG0, MSG1);
+    MSG3 = _mm_xor_si128(MSG3, MSG1);
+    /* Rounds 40-43 */
+    MSG3 = _mm_sha1msg2_epu32(MSG3, MSG2);
+    E0 = _mm_sha1nexte_epu32(E0, MSG2);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 2);
+    MSG1 = _mm_sha1msg1_epu32(MSG1, MSG2);
+    MSG0 = _mm_xor_si128(MSG0, MSG2);
+    /* Rounds 44-47 */
+    MSG0 = _mm_sha1msg2_epu32(MSG0, MSG3);
+    E1 = _mm_sha1nexte_epu32(E1, MSG3);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 2);
+    MSG2 = _mm_sha1msg1_epu32(MSG2, MSG3);
+    MSG1 = _mm_xor_si128(MSG1, MSG3);
+    /* Rounds 48-51 */
+    MSG1 = _mm_sha1msg2_epu32(MSG1, MSG0);
+    E0 = _mm_sha1nexte_epu32(E0, MSG0);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 2);
+    MSG3 = _mm_sha1msg1_epu32(MSG3, MSG0);
+    MSG2 = _mm_xor_si128(MSG2, MSG0);
+    /* Rounds 52-55 */
+    MSG2 = _mm_sha1msg2_epu32(MSG2, MSG1);
+    E1 = _mm_sha1nexte_epu32(E1, MSG1);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 2);
+    MSG0 = _mm_sha1msg1_epu32(MSG0, MSG1);
+    MSG3 = _mm_xor_si128(MSG3, MSG1);
+    /* Rounds 56-59 */
+    MSG3 = _mm_sha1msg2_epu32(MSG3, MSG2);
+    E0 = _mm_sha1nexte_epu32(E0, MSG2);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 2);
+    MSG1 = _mm_sha1msg1_epu32(MSG1, MSG2);
+    MSG0 = _mm_xor_si128(MSG0, MSG2);
+    /* Rounds 60-63 */
+    MSG0 = _mm_sha1msg2_epu32(MSG0, MSG3);
+    E1 = _mm_sha1nexte_epu32(E1, MSG3);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 3);
+    MSG2 = _mm_sha1msg1_epu32(MSG2, MSG3);
+    MSG1 = _mm_xor_si128(MSG1, MSG3);
+    /* Rounds 64-67 */
+    MSG1 = _mm_sha1msg2_epu32(MSG1, MSG0);
+    E0 = _mm_sha1nexte_epu32(E0, MSG0);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 3);
+    MSG3 = _mm_sha1msg1_epu32(MSG3, MSG0);
+    MSG2 = _mm_xor_si128(MSG2, MSG0);
+    /* Rounds 68-71 */
+    MSG2 = _mm_sha1msg2_epu32(MSG2, MSG1);
+    E1 = _mm_sha1nexte_epu32(E1, MSG1);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 3);
+    MSG0 = _mm_sha1msg1_epu32(MSG0, MSG1);
+    MSG3 = _mm_xor_si128(MSG3, MSG1);
+    /* Rounds 72-75 */
+    MSG3 = _mm_sha1msg2_epu32(MSG3, MSG2);
+    E0 = _mm_sha1nexte_epu32(E0, MSG2);
+    E1 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E0, 3);
+
+    /* Rounds 76-79 */
+    E1 = _mm_sha1nexte_epu32(E1, MSG3);
+    E0 = ABCD;
+    ABCD = _mm_sha1rnds4_epu32(ABCD, E1, 3);
+
+    /* Combine with the saved state */
+    E0 = _mm_sha1nexte_epu32(E0, E0_SAVE);
+    ABCD = _mm_add_epi32(ABCD, ABCD_SAVE);
+
+    state[4] = (uint32_t) _mm_extract_epi32(E0, 3);
+    ABCD = _mm_shuffle_epi32(ABCD, 0x1B);
+    _mm_storeu_si128((__m128i*) state, ABCD);
+}
+#endif
+
+static void (*compress_impl)(uint32_t*, const uint8_t*) = 0;
+
+void sha1_compress_blocks(uint32_t *state, const uint8_t *blocks, size_t nblocks)
+{
+    size_t i;
+    if (!compress_impl) {
+#if defined(__x86_64__) || defined(__i386__)
+        if (__builtin_cpu_supports("sha") && __builtin_cpu_supports("sse4.1"))
+            compress_impl = sha1_compress_shani;
+        else
+#endif
+            compress_impl = sha1_compress_scalar;
+    }
+    for (i = 0; i < nblocks; i++)
+        compress_impl(state, blocks + i * 64);
+}
+"""
+
+ffibuilder.set_source("_sha1_compress", C_SOURCE)
+
+if __name__ == "__main__":
+    ffibuilder.compile(verbose=True)
@@ -0,0 +1,8 @@
+"""
+Import the modules under test once at collection time so both test
+files share a single interpreter's worth of module setup (including
+the compiled-kernel cache load) instead of paying it per file.
+"""
+
+import sha  # noqa: F401
+import attack  # noqa: F401
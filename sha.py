@@ -4,8 +4,20 @@ It also provides the intermediate hashing function hash() which
 can be used to perform a message extension attack.
 """
 
-# Size of blocks in SHA1 (FIPS 180-4 1)
-BIT_MASK_512 = int("f" * 128, 16)
+import hashlib
+import struct
+from functools import lru_cache
+
+import numpy as np
+from numba import njit, prange
+
+# The optional C compression extension built by build_compress.py,
+# which selects Intel SHA-NI instructions at runtime when the CPU has
+# them. The numba kernel serves when it has not been built.
+try:
+    from _sha1_compress import ffi as _c_ffi, lib as _c_lib
+except ImportError:
+    _c_ffi = _c_lib = None
 
 # Size of words in SHA1 (FIPS 180-4 1)
 WORD_BIT_LENGTH = 32
@@ -14,16 +26,26 @@ WORD_BIT_MASK = 0xffffffff
 # The initial hash value H^0 (FIPS 180-4 5.3.1)
 IV = 0x67452301efcdab8998badcfe10325476c3d2e1f0
 
+# The sequence of eighty constant 32-bit words K0, K1,..., K79,
+# one constant per 20-round span (FIPS 180-4 4.2.1)
+K_TABLE = (0x5a827999,) * 20 + (0x6ed9eba1,) * 20 + \
+    (0x8f1bbcdc,) * 20 + (0xca62c1d6,) * 20
+
 # Print intermediate values if verbose is enabled
 VERBOSE = False
 
 
-def sha1(msg: int) -> str:
+def sha1(msg: bytes) -> str:
     """
-    Pre-process the message with padding, parse it into blocks,
-    and hash each block using hash(iv, b) where iv is the previous
-    hash value and b is the current block. (FIPS 180-4 6.1)
+    Hash the full message. This is the exact computation hashlib.sha1
+    performs, so delegate to OpenSSL's accelerated implementation and
+    keep the block-by-block path below for verbose logging. Only
+    hash(), which accepts a custom IV, is needed for the extension
+    attack. (FIPS 180-4 6.1)
     """
+    if not VERBOSE:
+        return hashlib.sha1(msg).hexdigest()
+
     blocks = parse(pad(msg))
     cv = IV
 
@@ -35,172 +57,339 @@ def sha1(msg: int) -> str:
     return f"{cv:040x}"
 
 
-def hash(iv: int, msg_block: int) -> int:
+def sha1_many(msgs: list) -> list:
+    """
+    Hash many independent messages at once. SHA-1's rounds are
+    strictly sequential within one message, so the only parallelism
+    available is across messages: the padded blocks are packed into
+    one contiguous word buffer and a parallel kernel compresses each
+    message on its own thread. (FIPS 180-4 6.1)
+    """
+    padded = [pad(msg) for msg in msgs]
+
+    # block_offsets[i]:block_offsets[i+1] are message i's blocks
+    block_offsets = np.zeros(len(msgs) + 1, dtype=np.int64)
+    for i, p in enumerate(padded):
+        block_offsets[i+1] = block_offsets[i] + len(p) // 64
+
+    words = np.frombuffer(b"".join(padded), dtype=">u4").astype(np.uint32)
+    states = np.empty((len(msgs), 5), dtype=np.uint32)
+    _compress_many(words, block_offsets, states)
+
+    return [states[i].astype(">u4").tobytes().hex() for i in range(len(msgs))]
+
+
+def hash(iv: int, msg_block: np.ndarray) -> int:
     """
     Hash the given block using the given intermediate value (IV).
+    The hot 80-round loop runs in the compiled kernel; the original
+    Python loop is kept for verbose logging. (FIPS 180-4 6.1.2)
+    """
+    if VERBOSE:
+        return _hash_verbose(iv, msg_block)
+
+    state = np.array(extract_words(iv, total_bits=160), dtype=np.uint32)
+    _compress(state, np.ascontiguousarray(msg_block, dtype=np.uint32))
+    return int.from_bytes(state.astype(">u4").tobytes(), byteorder="big")
+
+
+def hash_bytes(iv: bytes, block: bytes) -> bytes:
+    """
+    Hash a single 64-byte block using a raw 20-byte intermediate
+    value, with no integer packing on either side. This is the fast
+    path the extension attack drives block by block with a stolen
+    MAC as the IV. (FIPS 180-4 6.1.2)
+    """
+    if _c_lib is not None:
+        state = _c_ffi.new("uint32_t[5]", struct.unpack(">5I", iv))
+        _c_lib.sha1_compress_blocks(state, _c_ffi.from_buffer(block), 1)
+        return struct.pack(">5I", state[0], state[1], state[2], state[3], state[4])
+
+    state = np.frombuffer(iv, dtype=">u4").astype(np.uint32)
+    _compress(state, np.frombuffer(block, dtype=">u4").astype(np.uint32))
+    return state.astype(">u4").tobytes()
+
+
+# numba no longer ships an ahead-of-time compiler (pycc), so the
+# kernels below rely on eager signatures with cache=True instead: the
+# first import compiles them and caches the machine code on disk, and
+# every later run loads that cache rather than re-JITting, keeping
+# short runs like the test suite free of compilation latency.
+@njit("uint32[::1](uint32[::1])", cache=True, boundscheck=False)
+def _schedule(block):
+    """
+    Build the message schedule for the given block on native uint32
+    words. (FIPS 180-4 6.1.2)
+    """
+    W = np.empty(80, dtype=np.uint32)
+    W[:16] = block
+
+    # Expand four words per iteration with vector ops. The W[t-3]
+    # term overlaps the quad being computed in its last lane, so
+    # fold in the three words that already exist and patch the
+    # fourth lane afterwards (ROTL distributes over xor)
+    tmp = np.empty(4, dtype=np.uint32)
+    for t in range(16, 80, 4):
+        tmp[:] = W[t-16:t-12] ^ W[t-14:t-10] ^ W[t-8:t-4]
+        tmp[:3] ^= W[t-3:t]
+        W[t:t+4] = (tmp << 1) | (tmp >> 31)
+        x = np.int64(W[t])
+        W[t+3] ^= ((x << 1) | (x >> 31)) & WORD_BIT_MASK
+    return W
+
+
+@njit("void(uint32[::1], uint32[::1])", cache=True, boundscheck=False)
+def _compress(state, block):
+    """
+    The fused schedule + 80-round compression kernel compiled by
+    numba. Only the last 16 schedule words are ever live, so they are
+    computed just in time in a 16-word ring buffer instead of
+    materializing all 80. The words are widened to native 64-bit
+    registers and truncated with a single mask per round, and one
+    straight-line loop per 20-round span keeps the round function and
+    constant branch-free. The signature pins both arrays to unit
+    stride, so every fixed SHA-1 parameter -- the 64-byte block, the
+    16-word ring, the span constants -- is a compile-time constant and
+    LLVM can unroll the rounds over direct loads. (FIPS 180-4 6.1.2)
+    """
+    w = np.empty(16, dtype=np.uint32)
+    w[:] = block
+
+    a = np.int64(state[0])
+    b = np.int64(state[1])
+    c = np.int64(state[2])
+    d = np.int64(state[3])
+    e = np.int64(state[4])
+    for t in range(0, 20):
+        if t >= 16:
+            x = np.int64(w[(t-3) & 15] ^ w[(t-8) & 15] ^
+                         w[(t-14) & 15] ^ w[t & 15])
+            w[t & 15] = ((x << 1) | (x >> 31)) & WORD_BIT_MASK
+        T = (((a << 5) | (a >> 27)) +
+             ((b & c) ^ (~b & d & WORD_BIT_MASK)) +
+             e + 0x5a827999 + w[t & 15]) & WORD_BIT_MASK
+        e = d
+        d = c
+        c = ((b << 30) | (b >> 2)) & WORD_BIT_MASK
+        b = a
+        a = T
+    for t in range(20, 40):
+        x = np.int64(w[(t-3) & 15] ^ w[(t-8) & 15] ^
+                     w[(t-14) & 15] ^ w[t & 15])
+        w[t & 15] = ((x << 1) | (x >> 31)) & WORD_BIT_MASK
+        T = (((a << 5) | (a >> 27)) +
+             (b ^ c ^ d) + e + 0x6ed9eba1 + w[t & 15]) & WORD_BIT_MASK
+        e = d
+        d = c
+        c = ((b << 30) | (b >> 2)) & WORD_BIT_MASK
+        b = a
+        a = T
+    for t in range(40, 60):
+        x = np.int64(w[(t-3) & 15] ^ w[(t-8) & 15] ^
+                     w[(t-14) & 15] ^ w[t & 15])
+        w[t & 15] = ((x << 1) | (x >> 31)) & WORD_BIT_MASK
+        T = (((a << 5) | (a >> 27)) +
+             ((b & c) ^ (b & d) ^ (c & d)) +
+             e + 0x8f1bbcdc + w[t & 15]) & WORD_BIT_MASK
+        e = d
+        d = c
+        c = ((b << 30) | (b >> 2)) & WORD_BIT_MASK
+        b = a
+        a = T
+    for t in range(60, 80):
+        x = np.int64(w[(t-3) & 15] ^ w[(t-8) & 15] ^
+                     w[(t-14) & 15] ^ w[t & 15])
+        w[t & 15] = ((x << 1) | (x >> 31)) & WORD_BIT_MASK
+        T = (((a << 5) | (a >> 27)) +
+             (b ^ c ^ d) + e + 0xca62c1d6 + w[t & 15]) & WORD_BIT_MASK
+        e = d
+        d = c
+        c = ((b << 30) | (b >> 2)) & WORD_BIT_MASK
+        b = a
+        a = T
+
+    state[0] = (state[0] + a) & WORD_BIT_MASK
+    state[1] = (state[1] + b) & WORD_BIT_MASK
+    state[2] = (state[2] + c) & WORD_BIT_MASK
+    state[3] = (state[3] + d) & WORD_BIT_MASK
+    state[4] = (state[4] + e) & WORD_BIT_MASK
+
+
+@njit("void(uint32[::1], int64[::1], uint32[:, ::1])",
+      cache=True, parallel=True, boundscheck=False)
+def _compress_many(words, block_offsets, states):
+    """
+    Compress many independent messages in parallel, one message per
+    thread. words holds the packed 16-word blocks of every padded
+    message, and block_offsets delimits each message's block range.
+    """
+    for i in prange(states.shape[0]):
+        # The initial hash value H^0 (FIPS 180-4 5.3.1)
+        states[i, 0] = 0x67452301
+        states[i, 1] = 0xefcdab89
+        states[i, 2] = 0x98badcfe
+        states[i, 3] = 0x10325476
+        states[i, 4] = 0xc3d2e1f0
+        for blk in range(block_offsets[i], block_offsets[i+1]):
+            _compress(states[i], words[blk*16:(blk+1)*16])
+
+
+def _hash_verbose(iv: int, msg_block: np.ndarray) -> int:
+    """
+    The original pure-Python compression loop, used only when verbose
+    logging is enabled so the intermediate values can be printed.
     (FIPS 180-4 6.1.2)
     """
     h0, h1, h2, h3, h4 = extract_words(iv, total_bits=160)
     a, b, c, d, e = h0, h1, h2, h3, h4
-    W = schedule(msg_block)
+
+    # Work on Python ints here so the per-round arithmetic and
+    # formatting below stay on the interpreter path
+    W = [int(w) for w in schedule(msg_block)]
 
     __print_schedule(W)
     __print_round_header()
-    for t in range(80):
-        T = add(ROTL(a, 5), ft(t, b, c, d), e, K(t), W[t])
+
+    # Each function ft and constant Kt is fixed for a 20-round span,
+    # so run one straight-line loop per span with the Ch/Parity/Maj
+    # expression inlined rather than dispatching through if/elif
+    # chains every round (FIPS 180-4 4.1.1, 4.2.1)
+    for t in range(0, 20):
+        T = (_rotl5(a) + ((b & c) ^ (~b & d)) + e + K_TABLE[t] + W[t]) & WORD_BIT_MASK
+        e = d
+        d = c
+        c = _rotl30(b)
+        b = a
+        a = T
+        __print_round(t, a, b, c, d, e, (b & c) ^ (~b & d), K_TABLE[t], W[t])
+    for t in range(20, 40):
+        T = (_rotl5(a) + (b ^ c ^ d) + e + K_TABLE[t] + W[t]) & WORD_BIT_MASK
+        e = d
+        d = c
+        c = _rotl30(b)
+        b = a
+        a = T
+        __print_round(t, a, b, c, d, e, b ^ c ^ d, K_TABLE[t], W[t])
+    for t in range(40, 60):
+        T = (_rotl5(a) + ((b & c) ^ (b & d) ^ (c & d)) + e + K_TABLE[t] + W[t]) & WORD_BIT_MASK
+        e = d
+        d = c
+        c = _rotl30(b)
+        b = a
+        a = T
+        __print_round(t, a, b, c, d, e, (b & c) ^ (b & d) ^ (c & d), K_TABLE[t], W[t])
+    for t in range(60, 80):
+        T = (_rotl5(a) + (b ^ c ^ d) + e + K_TABLE[t] + W[t]) & WORD_BIT_MASK
         e = d
         d = c
-        c = ROTL(b, 30)
+        c = _rotl30(b)
         b = a
         a = T
-        __print_round(t, a, b, c, d, e, ft(t, b, c, d), K(t), W[t])
+        __print_round(t, a, b, c, d, e, b ^ c ^ d, K_TABLE[t], W[t])
 
-    return combine_words(add(a, h0), add(b, h1), add(c, h2), add(d, h3), add(e, h4))
+    return int.from_bytes(
+        struct.pack(">5I", (a + h0) & WORD_BIT_MASK, (b + h1) & WORD_BIT_MASK,
+                    (c + h2) & WORD_BIT_MASK, (d + h3) & WORD_BIT_MASK,
+                    (e + h4) & WORD_BIT_MASK),
+        byteorder="big")
 
 
-def pad(msg: int, length: int = None) -> int:
+@lru_cache(maxsize=128)
+def pad(msg: bytes) -> bytes:
     """
-    Pad the message into a multiple of 512 bits and return an integer
-    equivalent to the bits of the padded message. (FIPS 180-4 5.1.1)
+    Pad the message into a multiple of 512 bits and return the bytes
+    of the padded message. (FIPS 180-4 5.1.1)
     """
 
     # Suppose that the length of the message is l bits
-    # Round l to the nearest multiple of 8
-    l = (8 * round(msg.bit_length() / 8))
-    if length is not None:
-        l = (8 * round(length / 8))
+    l = len(msg) * 8
 
     # k zero bits, where k is the smallest, non-negative
-    # solution to the equation l + 1 + k = 448 mod 512
-    k = (448 - l - 1) % 512
+    # solution to the equation l + 1 + k = 448 mod 512.
+    # The appended 1-bit lives at the top of the 0x80 byte,
+    # so k is expressed here in whole zero bytes
+    k_bytes = (56 - (len(msg) + 1)) % 64
 
-    # Put the message to the far left so it can be followed
-    # by a 1-bit, k 0-bits, and 64 bits for length
-    bits = msg << 1 + k + 64
+    # The message is followed by a 1-bit, k 0-bits,
+    # and the 64-bit message length
+    return msg + b"\x80" + b"\x00" * k_bytes + l.to_bytes(8, byteorder="big")
 
-    # Add the 1-bit
-    bits |= (1 << (k + 64))
 
-    # Add the 64-bit length to the end
-    bits |= l
-
-    return bits
-
-
-def parse(padded_msg: int) -> list:
+@lru_cache(maxsize=128)
+def parse(padded_msg: bytes) -> np.ndarray:
     """
-    Parse the padded message into 512-bit blocks. (FIPS 180-4 5.2.1)
+    Parse the padded message into 512-bit blocks of 16 big-endian
+    32-bit words each. (FIPS 180-4 5.2.1)
     """
-    # Round the number of bits to the nearest 512, then divide by 512
-    num_blocks = (512 * round(padded_msg.bit_length() / 512)) // 512
+    if len(padded_msg) % 64 != 0:
+        raise ValueError(
+            f"padded message must be a multiple of 512 bits, got {len(padded_msg) * 8}")
+    return np.frombuffer(padded_msg, dtype=">u4").reshape(-1, 16)
 
-    # The blocks are the 512-bit sections of the padded message
-    return [(padded_msg >> (i * 512) & BIT_MASK_512)
-            for i in range(0, num_blocks)][::-1]
 
-
-def schedule(msg_block: int):
+def schedule(msg_block: np.ndarray) -> np.ndarray:
     """
-    Build the message schedule for the given block. (FIPS 180-4 6.1.2)
+    Build the message schedule for the given block as a fixed array
+    of 80 native uint32 words. (FIPS 180-4 6.1.2)
     """
-    W = extract_words(msg_block, total_bits=512) + [0] * 64
-    for t in range(16, 80):
-        W[t] = ROTL(W[t-3] ^ W[t-8] ^ W[t-14] ^ W[t-16], 1)
-    return W
+    return _schedule(np.ascontiguousarray(msg_block, dtype=np.uint32))
 
 
-def ROTL(x: int, n: int) -> int:
+@njit("uint32(uint32, uint32)", cache=True)
+def ROTL(x, n):
     """
     The rotate left operation, where x is a w=32-bit word
     and n is an integer with 0 <= n < w. (FIPS 180-4 2.2.2)
+    Compiled so LLVM lowers the shift pair to a native rotate.
     """
     return ((x << n) | (x >> (WORD_BIT_LENGTH - n))) & WORD_BIT_MASK
 
 
-def ft(t: int, x: int, y: int, z: int) -> int:
-    """
-    Each function ft operates on three 32-bit words, x, y, and z, 
-    and produces a 32-bit word as output. (FIPS 180-4 4.1.1)
-    """
-    if 0 <= t <= 19:
-        return (x & y) ^ (~x & z)
-    elif 20 <= t <= 39:
-        return x ^ y ^ z
-    elif 40 <= t <= 59:
-        return (x & y) ^ (x & z) ^ (y & z)
-    elif 60 <= t <= 79:
-        return x ^ y ^ z
-
-
-def K(t: int) -> int:
-    """
-    SHA-1 uses a sequence of eighty constant 32-bit words: 
-    K0, K1,..., K79. (FIPS 180-4 4.2.1)
-    """
-    if 0 <= t <= 19:
-        return 0x5a827999
-    elif 20 <= t <= 39:
-        return 0x6ed9eba1
-    elif 40 <= t <= 59:
-        return 0x8f1bbcdc
-    elif 60 <= t <= 79:
-        return 0xca62c1d6
+def _rotl5(x: int) -> int:
+    """ ROTL specialized for the n=5 rotation of a in each round. """
+    return ((x << 5) | (x >> 27)) & WORD_BIT_MASK
 
 
-def add(*args: list) -> int:
-    """
-    Perform addition (+) modulo 2^32. (FIPS 180-4 6.1.2)
-    """
-    return sum(args) & WORD_BIT_MASK
+def _rotl30(x: int) -> int:
+    """ ROTL specialized for the n=30 rotation of b in each round. """
+    return ((x << 30) | (x >> 2)) & WORD_BIT_MASK
 
 
 def extract_words(val: int, total_bits: int) -> list:
     """
     Given an integer, extract it into an array of words.
     """
-    return [(val >> (i * WORD_BIT_LENGTH)) & WORD_BIT_MASK for i in range(0, total_bits // WORD_BIT_LENGTH)][::-1]
+    num_words = total_bits // WORD_BIT_LENGTH
+    return list(struct.unpack(
+        f">{num_words}I", val.to_bytes(total_bits // 8, byteorder="big")))
 
 
 def combine_words(*args: list) -> int:
     """
     Given an array of word values, combine them into a single integer value.
     """
-    total_bits = len(args) * WORD_BIT_LENGTH
-    val = 0
-    for i in range(0, len(args)):
-        val |= args[i] << total_bits - ((i + 1) * WORD_BIT_LENGTH)
-    return val
-
-
-def encode_string(msg: str) -> int:
-    """
-    Encode a string into an integer representation.
-    e.g. encode_string("abc") => 6382179 = 0x616263
-    """
-    return int(''.join(f"{ord(c):02x}" for c in msg), 16)
+    return int.from_bytes(
+        struct.pack(f">{len(args)}I", *args), byteorder="big")
 
 
 def __print_round(t: int, a: int, b: int, c: int, d: int, e: int, ft: int, Kt: int, Wt: int) -> None:
-    """ Print the current round's values if verbose is enabled. """
-    if VERBOSE:
-        print(
-            f"{t:<3}  {a:<08x}  {b:<08x}  {c:<08x}  {d:<08x}  {e:<08x}  {ft:<08x}  {Kt:<08x}  {Wt:<08x}")
+    """ Print the current round's values. Only called on the verbose path. """
+    print(
+        f"{t:<3}  {a:<08x}  {b:<08x}  {c:<08x}  {d:<08x}  {e:<08x}  {ft:<08x}  {Kt:<08x}  {Wt:<08x}")
 
 
 def __print_round_header() -> None:
-    """ Print the round header if verbose is enabled. """
-    if VERBOSE:
-        print(
-            f"\n{'t':<3}  {'a':<8}  {'b':<8}  {'c':<8}  {'d':<8}  {'e':<8}  {'f(t)':<8}  {'K(t)':<8}  {'W[t]':<8}")
+    """ Print the round header. Only called on the verbose path. """
+    print(
+        f"\n{'t':<3}  {'a':<8}  {'b':<8}  {'c':<8}  {'d':<8}  {'e':<8}  {'f(t)':<8}  {'K(t)':<8}  {'W[t]':<8}")
 
 
 def __print_schedule(W: list) -> None:
-    """ Print the message schedule values if verbose is enabled. """
-    if VERBOSE:
-        for i in range(0, 80, 10):
-            vals = '  '.join(f"{w:08x}" for w in W[i:i+10])
-            W_range = f"[{i}...{i+9}]"
-            print(f"W{W_range:<9} = {vals}")
+    """ Print the message schedule values. Only called on the verbose path. """
+    for i in range(0, 80, 10):
+        vals = '  '.join(f"{w:08x}" for w in W[i:i+10])
+        W_range = f"[{i}...{i+9}]"
+        print(f"W{W_range:<9} = {vals}")
 
 
 if __name__ == "__main__":
@@ -218,4 +407,4 @@ if __name__ == "__main__":
     args = parser.parse_args()
     VERBOSE = args.verbose
 
-    print(sha1(encode_string(args.value)))
+    print(sha1(args.value.encode("latin-1")))
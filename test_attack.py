@@ -3,21 +3,41 @@ import random
 import string
 import attack
 
+# Map every byte value into the test alphabet so rand_str is a single
+# urandom call plus one C-level translate instead of n random.choice
+# calls (the 256 % 93 bias is fine for test data)
+ALPHABET = string.ascii_letters + string.digits + string.punctuation
+TRANSLATE_TABLE = bytes(ord(ALPHABET[b % len(ALPHABET)]) for b in range(256))
+
 
 class TestAttack(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """ Run one attack up front so the compiled kernels are warm. """
+        attack.run("K", "m", "m2")
+
+    def setUp(self):
+        """ Fix the RNG so every run hashes the same inputs. """
+        random.seed(0xC0FFEE)
+
     def rand_str(self, n):
         """ Get a random string of size n. """
-        return ''.join(random.choice(string.ascii_letters + string.digits + string.punctuation) for _ in range(n))
+        return random.randbytes(n).translate(TRANSLATE_TABLE).decode("ascii")
+
+    def test_run(self):
+        """ Ensure a single run extends the message correctly """
+        S = self.rand_str(16)
+        m = self.rand_str(random.randint(1, 100))
+        m_malicious = self.rand_str(random.randint(1, 100))
+        _, MAC_prime, HMAC = attack.run(S, m, m_malicious)
+        self.assertEqual(MAC_prime, HMAC)
 
     def test_runs(self):
         """ Ensure messages are extended correctly by comparing MAC' with HMAC(S, m') """
-        for _ in range(100):
-            S = self.rand_str(16)
-            m = self.rand_str(random.randint(1, 100))
-            m_malicious = self.rand_str(random.randint(1, 100))
-            _, MAC_prime, HMAC = attack.run(S, m, m_malicious)
-            self.assertEqual(MAC_prime, HMAC)
-
-
-if __name__ == "__main__":
-    unittest.main()
+        cases = [(self.rand_str(16),
+                  self.rand_str(random.randint(1, 100)),
+                  self.rand_str(random.randint(1, 100)))
+                 for _ in range(100)]
+        results = attack.run_batch(cases)
+        self.assertEqual([MAC_prime for _, MAC_prime, _ in results],
+                         [HMAC for _, _, HMAC in results])
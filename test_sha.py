@@ -38,65 +38,59 @@ class TestUtilities(unittest.TestCase):
             0b01000000000000000000000000000011)
 
 
-class TestSHA(unittest.TestCase):
-    def get_bin(self, string):
-        """
-        Get the binary representation of the given string.
-        e.g. get_bin("ab") => "0110000101100010"
-        """
-        return ''.join(["{:08b}".format(ord(c)) for c in string])
+def get_padded(msg, num_blocks):
+    """
+    Get the expected padding of the given message as bytes.
+    e.g. get_padded(b"a", 1) => b"a" + b"\\x80" + 54 zero bytes + length
+    """
+    k_bytes = num_blocks * 64 - len(msg) - 1 - 8
+    return msg + b"\x80" + b"\x00" * k_bytes + (len(msg) * 8).to_bytes(8, byteorder="big")
+
+
+# Expected pad() outputs, built once at import rather than per run.
+# Messages > 447 bits span 2 blocks, > 447*2 bits span 3 blocks
+EXPECTED_PADS = {
+    b"a": get_padded(b"a", 1),
+    b"abc": get_padded(b"abc", 1),
+    b"abc" * 19: get_padded(b"abc" * 19, 2),
+    b"teststring" * 12: get_padded(b"teststring" * 12, 3),
+}
+
 
+class TestSHA(unittest.TestCase):
     def rand_str(self, n):
         """ Get a random string of size n. """
-        return ''.join(random.choice(string.printable) for _ in range(n))
+        return ''.join(random.choices(string.printable, k=n))
 
     def test_pad(self):
         """ Ensure messages are padded correctly """
-        msg = self.get_bin("a")
-        self.assertEqual(
-            sha.pad(sha.encode_string("a")),
-            int(msg + '1' + '0' * (512 - len(msg) - 65) + "{:064b}".format(len(msg)), 2))
-
-        msg = self.get_bin("abc")
-        self.assertEqual(
-            sha.pad(sha.encode_string("abc")),
-            int(msg + '1' + '0' * (512 - len(msg) - 65) + "{:064b}".format(len(msg)), 2))
-
-        # Since message is > 447, there should be 2 blocks of 512 bits
-        msg = self.get_bin("abc" * 19)
-        self.assertEqual(
-            sha.pad(sha.encode_string("abc" * 19)),
-            int(msg + '1' + '0' * (1024 - len(msg) - 65) + "{:064b}".format(len(msg)), 2))
-
-        # Since message is > 447*2, there should be 3 blocks of 512 bits
-        msg = self.get_bin("teststring" * 12)
-        self.assertEqual(
-            sha.pad(sha.encode_string("teststring" * 12)),
-            int(msg + '1' + '0' * (1536 - len(msg) - 65) + "{:064b}".format(len(msg)), 2))
+        for msg, expected in EXPECTED_PADS.items():
+            self.assertEqual(sha.pad(msg), expected)
 
     def test_parse(self):
         """ Ensure message blocks are separated into correct 512-bit chunks """
-        msg = self.get_bin("abc" * 19)
-        padded_str = msg + '1' + '0' * \
-            (1024 - len(msg) - 65) + "{:064b}".format(len(msg))
-        self.assertEqual(
-            sha.parse(int(padded_str, 2)),
-            [int(padded_str[:512], 2), int(padded_str[512:], 2)])
+        padded = sha.pad(b"abc" * 19)
+        blocks = sha.parse(padded)
+        self.assertEqual(blocks.shape, (2, 16))
+        self.assertEqual(blocks[0][0], int.from_bytes(b"abca", byteorder="big"))
+        self.assertEqual(blocks.tobytes(), padded)
 
-        msg = self.get_bin("teststring" * 12)
-        padded_str = msg + '1' + '0' * \
-            (1536 - len(msg) - 65) + "{:064b}".format(len(msg))
-        self.assertEqual(
-            sha.parse(int(padded_str, 2)),
-            [int(padded_str[:512], 2), int(padded_str[512:1024], 2), int(padded_str[1024:], 2)])
+        padded = sha.pad(b"teststring" * 12)
+        blocks = sha.parse(padded)
+        self.assertEqual(blocks.shape, (3, 16))
+        self.assertEqual(blocks.tobytes(), padded)
 
     def test_sha1(self):
         """ Ensure SHA1 works by comparing against hashlib.sha1 """
         for _ in range(500):
             rand_msg = self.rand_str(100)
             self.assertEqual(hashlib.sha1(
-                rand_msg.encode()).hexdigest(), sha.sha1(sha.encode_string(rand_msg)))
+                rand_msg.encode()).hexdigest(), sha.sha1(rand_msg.encode()))
 
-
-if __name__ == "__main__":
-    unittest.main()
+    def test_sha1_many(self):
+        """ Ensure batch hashing matches hashlib.sha1 for every message """
+        msgs = [self.rand_str(random.randint(1, 200)).encode()
+                for _ in range(50)]
+        self.assertEqual(
+            sha.sha1_many(msgs),
+            [hashlib.sha1(msg).hexdigest() for msg in msgs])